@@ -1,19 +1,86 @@
 """
 LangGraph-based agentic framework for persona switching and state management.
 """
+import asyncio
 import os
-from typing import TypedDict, Annotated
+import threading
+from datetime import datetime
+from typing import TypedDict, Annotated, AsyncIterator, Awaitable, Optional, TypeVar
+import httpx
+import orjson
+from cachetools import LRUCache
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, BaseMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
+from app.models.database import UserThread
 from app.repositories.thread_repository import ThreadRepository
+from app.services.response_cache import ResponseCache
 from app.utils.persona_manager import PersonaManager
-from app.core.config import settings
+from app.core.config import (
+    settings,
+    MODEL_NAME,
+    TEMPERATURE,
+    LLM_MAX_CONCURRENCY,
+    HISTORY_WINDOW_TURNS,
+    ENABLE_PROMPT_CACHE
+)
 from app.core.exceptions import LLMError, ConfigurationError
 from app.core.logging_config import logger
 
 
+# Stored message role -> LangChain message class
+_MESSAGE_TYPES = {"user": HumanMessage, "assistant": AIMessage}
+
+# LLM clients shared by all agents, keyed by (model_name, temperature), so the
+# underlying HTTP connection pool and TLS sessions are reused across requests
+_LLM_CACHE: dict[tuple[str, float], ChatOpenAI] = {}
+
+# Bounds in-flight LLM calls across all agents in this process to stay under provider rate limits
+_LLM_SEMAPHORE = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+
+# Event loop that runs the sync chat interfaces. Pooled connections in the shared LLM
+# clients belong to the loop that opened them, so the sync calls must keep using one
+# loop rather than a fresh asyncio.run() loop each time.
+_sync_loop: Optional[asyncio.AbstractEventLoop] = None
+_sync_loop_lock = threading.Lock()
+
+_T = TypeVar("_T")
+
+
+def _run_sync(coro: Awaitable[_T]) -> _T:
+    """Run a coroutine to completion on the persistent background loop."""
+    global _sync_loop
+    with _sync_loop_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=_sync_loop.run_forever, name="agent-sync-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _sync_loop).result()
+
+
+def get_llm(model_name: str, temperature: float, api_key: str) -> ChatOpenAI:
+    """Get the shared LLM client for a model and temperature."""
+    key = (model_name, temperature)
+    llm = _LLM_CACHE.get(key)
+    if llm is None:
+        llm = ChatOpenAI(
+            model=model_name,
+            temperature=temperature,
+            api_key=api_key,
+            max_retries=settings.llm_max_retries,
+            http_async_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.llm_max_connections,
+                    max_keepalive_connections=settings.llm_max_keepalive_connections
+                )
+            )
+        )
+        _LLM_CACHE[key] = llm
+    return llm
+
+
 class AgentState(TypedDict):
     """State for the LangGraph agent."""
     messages: Annotated[list[BaseMessage], add_messages]
@@ -21,15 +88,26 @@ class AgentState(TypedDict):
     thread_name: str
     thread_id: int
     persona_prompt: str
+    thread_updated_at: Optional[datetime]
 
 
 class PersonaSwitchingAgent:
-    """Agent that manages persona switching and conversation threads."""
+    """
+    Agent that manages persona switching and conversation threads.
+    
+    The agent holds no per-request state, so one instance is shared by the whole
+    process (see get_agent); each call is given the repository for its own session.
+    """
     
-    def __init__(self, repository: ThreadRepository, model_name: str = None):
-        self.repository = repository
+    def __init__(self, model_name: str = None):
         self.persona_manager = PersonaManager()
         
+        # thread_id -> (thread updated_at, LangChain history); the timestamp guards
+        # against entries made stale by writes from other processes
+        self._history_cache: LRUCache = LRUCache(maxsize=settings.history_cache_size)
+        self._response_cache = ResponseCache(maxsize=settings.response_cache_size)
+        self._llm_sem = _LLM_SEMAPHORE
+        
         # Initialize LLM
         api_key = settings.openai_api_key or os.getenv("OPENAI_API_KEY")
         if not api_key:
@@ -37,15 +115,11 @@ class PersonaSwitchingAgent:
                 "OPENAI_API_KEY not found. Please set it in environment variables or .env file"
             )
         
-        self.llm = ChatOpenAI(
-            model=model_name or settings.model_name,
-            temperature=settings.temperature,
-            api_key=api_key
-        )
+        self.llm = get_llm(model_name or MODEL_NAME, TEMPERATURE, api_key)
         
         # Build the graph
         self.graph = self._build_graph()
-        logger.info(f"Initialized PersonaSwitchingAgent with model: {model_name or settings.model_name}")
+        logger.info(f"Initialized PersonaSwitchingAgent with model: {model_name or MODEL_NAME}")
     
     def _build_graph(self) -> StateGraph:
         """Build the LangGraph state machine."""
@@ -66,8 +140,9 @@ class PersonaSwitchingAgent:
         
         return workflow.compile()
     
-    def _route_message(self, state: AgentState) -> AgentState:
+    async def _route_message(self, state: AgentState, config: RunnableConfig) -> AgentState:
         """Route message to determine if we need to switch threads or create new ones."""
+        repository = self._repository(config)
         messages = state["messages"]
         user_id = state["user_id"]
         last_message = messages[-1]
@@ -78,16 +153,11 @@ class PersonaSwitchingAgent:
             # If thread_name is explicitly provided in state, use it
             if state.get("thread_name") and state["thread_name"] != "":
                 thread_name = state["thread_name"]
-                existing_thread = self.repository.get_thread(user_id, thread_name)
-                if existing_thread:
-                    state["thread_id"] = existing_thread.id
-                    state["persona_prompt"] = existing_thread.persona_prompt
-                else:
-                    # Create thread with base persona if it doesn't exist
-                    persona_prompt = self.persona_manager.BASE_META_PROMPT
-                    new_thread = self.repository.create_thread(user_id, thread_name, persona_prompt)
-                    state["thread_id"] = new_thread.id
-                    state["persona_prompt"] = persona_prompt
+                existing_thread = await asyncio.to_thread(repository.get_thread, user_id, thread_name)
+                self._apply_thread(
+                    state,
+                    await self._ensure_named_thread(repository, user_id, thread_name, existing_thread)
+                )
                 return state
             
             # Check if this is a persona switch request
@@ -98,112 +168,198 @@ class PersonaSwitchingAgent:
                 thread_name = self.persona_manager.normalize_thread_name(persona_name)
                 
                 # Check if thread exists
-                existing_thread = self.repository.get_thread(user_id, thread_name)
+                existing_thread = await asyncio.to_thread(repository.get_thread, user_id, thread_name)
                 
                 if existing_thread:
                     # Switch to existing thread
-                    state["thread_id"] = existing_thread.id
-                    state["thread_name"] = thread_name
-                    state["persona_prompt"] = existing_thread.persona_prompt
+                    self._apply_thread(state, existing_thread)
                 else:
                     # Create new thread
                     persona_prompt = self.persona_manager.get_persona_prompt(persona_name)
-                    new_thread = self.repository.create_thread(user_id, thread_name, persona_prompt)
-                    state["thread_id"] = new_thread.id
-                    state["thread_name"] = thread_name
-                    state["persona_prompt"] = persona_prompt
+                    new_thread = await asyncio.to_thread(
+                        repository.create_thread, user_id, thread_name, persona_prompt
+                    )
+                    self._apply_thread(state, new_thread)
             else:
                 # Use existing thread or create default
                 if "thread_id" not in state or state["thread_id"] == 0:
                     # Try to get the most recently used thread
-                    recent_thread = self.repository.get_most_recent_thread(user_id)
+                    recent_thread = await asyncio.to_thread(repository.get_most_recent_thread, user_id)
                     
                     if recent_thread:
                         # Use the most recent thread
-                        state["thread_id"] = recent_thread.id
-                        state["thread_name"] = recent_thread.thread_name
-                        state["persona_prompt"] = recent_thread.persona_prompt
+                        self._apply_thread(state, recent_thread)
                     else:
                         # Create a default thread if none exists
-                        thread_name = "default"
-                        persona_prompt = self.persona_manager.BASE_META_PROMPT
-                        new_thread = self.repository.create_thread(user_id, thread_name, persona_prompt)
-                        state["thread_id"] = new_thread.id
-                        state["thread_name"] = thread_name
-                        state["persona_prompt"] = persona_prompt
+                        new_thread = await self._ensure_named_thread(repository, user_id, "default", None)
+                        self._apply_thread(state, new_thread)
         
         return state
     
-    def _process_message(self, state: AgentState) -> AgentState:
+    async def _ensure_named_thread(
+        self,
+        repository: ThreadRepository,
+        user_id: str,
+        thread_name: str,
+        existing_thread: Optional[UserThread]
+    ) -> UserThread:
+        """Return an already looked-up named thread, creating it with the base persona if it was missing."""
+        if existing_thread is not None:
+            return existing_thread
+        return await asyncio.to_thread(
+            repository.create_thread, user_id, thread_name, self.persona_manager.BASE_META_PROMPT
+        )
+    
+    @staticmethod
+    def _apply_thread(state: AgentState, thread: UserThread) -> None:
+        """Point the state at a thread."""
+        state["thread_id"] = thread.id
+        state["thread_updated_at"] = thread.updated_at
+        state["thread_name"] = thread.thread_name
+        state["persona_prompt"] = thread.persona_prompt
+    
+    async def _process_message(self, state: AgentState, config: RunnableConfig) -> AgentState:
         """Process the message with the LLM using the appropriate persona context."""
-        messages = state["messages"]
+        conversation_messages = await self._build_conversation(self._repository(config), state)
+        
+        # Add assistant response to state
+        state["messages"].append(await self._complete(state, conversation_messages))
+        
+        return state
+    
+    async def _complete(self, state: AgentState, conversation_messages: list[BaseMessage]) -> AIMessage:
+        """Get the assistant's reply to a built conversation."""
         thread_id = state["thread_id"]
-        persona_prompt = state["persona_prompt"]
         
         try:
-            # Load conversation history for this thread
-            history_messages = self.repository.get_thread_messages(thread_id)
-            
-            # Build message list with system prompt and history
-            conversation_messages = [SystemMessage(content=persona_prompt)]
+            # Reuse the response to an identical recent exchange, otherwise ask the LLM
+            cache_key = ResponseCache.make_key(conversation_messages)
+            cached_response = self._response_cache.get(cache_key)
+            if cached_response is not None:
+                logger.debug(f"Response cache hit for thread {thread_id}")
+                return AIMessage(content=cached_response)
             
-            # Add historical messages (excluding the current one)
-            for msg in history_messages:
-                if msg.role == "user":
-                    conversation_messages.append(HumanMessage(content=msg.content))
-                elif msg.role == "assistant":
-                    conversation_messages.append(AIMessage(content=msg.content))
-            
-            # Add the current user message
-            conversation_messages.extend(messages)
-            
-            # Get response from LLM
             logger.debug(f"Invoking LLM for thread {thread_id}")
-            response = self.llm.invoke(conversation_messages)
-            
-            # Add assistant response to state
-            state["messages"].append(response)
-            
-            return state
+            async with self._llm_sem:
+                response = await self.llm.ainvoke(conversation_messages, **self._llm_kwargs(thread_id))
+            self._response_cache.put(cache_key, response.content)
+            return response
         except Exception as e:
             logger.error(f"Error processing message with LLM: {e}")
             raise LLMError(f"Failed to process message: {str(e)}")
     
-    def _save_message(self, state: AgentState) -> AgentState:
+    async def _build_conversation(self, repository: ThreadRepository, state: AgentState) -> list[BaseMessage]:
+        """
+        Build the LLM input: persona prompt, recent history and the current user message.
+        
+        This is the last database read before the LLM call, so it also hands the session's
+        connection back to the pool; otherwise every turn waiting on the LLM holds one.
+        """
+        history = await self._load_history(repository, state["thread_id"], state.get("thread_updated_at"))
+        await asyncio.to_thread(repository.release_connection)
+        
+        # Only send the most recent turns to bound prompt size
+        if HISTORY_WINDOW_TURNS > 0:
+            history = history[-2 * HISTORY_WINDOW_TURNS:]
+        
+        # The order is append-only so consecutive turns share a cacheable prefix
+        return [SystemMessage(content=state["persona_prompt"]), *history, *state["messages"]]
+    
+    async def _save_message(self, state: AgentState, config: RunnableConfig) -> AgentState:
         """Save user and assistant messages to the database."""
+        repository = self._repository(config)
         messages = state["messages"]
         thread_id = state["thread_id"]
         
         try:
-            # Get the last user and assistant messages
-            user_message = None
-            assistant_message = None
-            
-            for msg in reversed(messages):
-                if isinstance(msg, HumanMessage) and user_message is None:
-                    user_message = msg
-                elif isinstance(msg, AIMessage) and assistant_message is None:
-                    assistant_message = msg
-                if user_message and assistant_message:
-                    break
-            
-            # Save messages
-            if user_message:
-                self.repository.add_message(thread_id, "user", user_message.content)
+            # The turn always ends with the user message followed by the response
+            # appended by _process_message
+            user_message, assistant_message = messages[-2], messages[-1]
+            assert isinstance(user_message, HumanMessage) and isinstance(assistant_message, AIMessage)
             
-            if assistant_message:
-                self.repository.add_message(thread_id, "assistant", assistant_message.content)
+            # Save both messages in a single transaction
+            to_save = [("user", user_message.content), ("assistant", assistant_message.content)]
+            updated_at = await asyncio.to_thread(
+                repository.add_messages_bulk, thread_id, to_save
+            )
+            self._extend_history_cache(
+                thread_id, state.get("thread_updated_at"), updated_at, to_save
+            )
             
             return state
         except Exception as e:
             logger.error(f"Error saving messages: {e}")
             raise
     
-    def chat(self, user_id: str, message: str, thread_name: str = None) -> dict:
+    @staticmethod
+    def _config(repository: ThreadRepository) -> RunnableConfig:
+        """Build the run config that carries a call's repository to the graph nodes."""
+        return {"configurable": {"repository": repository}}
+    
+    @staticmethod
+    def _repository(config: RunnableConfig) -> ThreadRepository:
+        """Get the repository passed to the current call."""
+        return config["configurable"]["repository"]
+    
+    @staticmethod
+    def _llm_kwargs(thread_id: int) -> dict:
+        """Per-call LLM options; routes a thread's turns to the same prompt cache."""
+        if ENABLE_PROMPT_CACHE:
+            return {"prompt_cache_key": f"thread-{thread_id}"}
+        return {}
+    
+    async def _load_history(
+        self, repository: ThreadRepository, thread_id: int, updated_at: Optional[datetime]
+    ) -> list[BaseMessage]:
+        """Get the thread's history as LangChain messages, using the cache when it is current."""
+        cached = self._history_cache.get(thread_id)
+        if cached is not None and updated_at is not None and cached[0] == updated_at:
+            return cached[1]
+        
+        rows = await asyncio.to_thread(repository.get_thread_history_tuples, thread_id)
+        history = [
+            _MESSAGE_TYPES[role](content=content) for role, content in rows if role in _MESSAGE_TYPES
+        ]
+        
+        if updated_at is not None:
+            self._history_cache[thread_id] = (updated_at, history)
+        return history
+    
+    def _extend_history_cache(
+        self,
+        thread_id: int,
+        previous_updated_at: Optional[datetime],
+        updated_at: datetime,
+        saved: list[tuple[str, str]]
+    ) -> None:
+        """Append a saved turn to the cached history, or drop the entry if it was stale."""
+        cached = self._history_cache.get(thread_id)
+        if cached is None:
+            return
+        if cached[0] != previous_updated_at:
+            del self._history_cache[thread_id]
+            return
+        
+        history = cached[1]
+        history.extend(_MESSAGE_TYPES[role](content=content) for role, content in saved)
+        self._history_cache[thread_id] = (updated_at, history)
+    
+    def chat(self, repository: ThreadRepository, user_id: str, message: str, thread_name: str = None) -> dict:
+        """
+        Synchronous chat interface for callers without a running event loop.
+        
+        See achat for details.
+        """
+        return _run_sync(self.achat(repository, user_id, message, thread_name))
+    
+    async def achat(
+        self, repository: ThreadRepository, user_id: str, message: str, thread_name: str = None
+    ) -> dict:
         """
         Main chat interface.
         
         Args:
+            repository: Repository for the caller's database session
             user_id: User identifier
             message: User's message
             thread_name: Optional thread name to use (if None, will be determined from message)
@@ -211,19 +367,141 @@ class PersonaSwitchingAgent:
         Returns:
             Dictionary with response and thread information
         """
-        # Initialize state
-        initial_state: AgentState = {
-            "messages": [HumanMessage(content=message)],
-            "user_id": user_id,
-            "thread_name": thread_name or "",
-            "thread_id": 0,
-            "persona_prompt": ""
-        }
+        state = self._initial_state(user_id, message, thread_name)
+        config = self._config(repository)
+        
+        # Fast path: an explicitly named thread needs no persona routing, so resolve it
+        # here (creating it if missing) and run the process and save steps directly
+        # without the graph runtime
+        if thread_name:
+            existing_thread = await asyncio.to_thread(repository.get_thread, user_id, thread_name)
+            self._apply_thread(
+                state,
+                await self._ensure_named_thread(repository, user_id, thread_name, existing_thread)
+            )
+            final_state = await self._save_message(await self._process_message(state, config), config)
+        else:
+            final_state = await self.graph.ainvoke(state, config=config)
+        
+        return self._result(final_state)
+    
+    def chat_batch(self, repository: ThreadRepository, items: list[dict]) -> list[dict]:
+        """
+        Synchronous batch chat interface for callers without a running event loop.
         
-        # Run the graph
-        final_state = self.graph.invoke(initial_state)
+        See achat_batch for details.
+        """
+        return _run_sync(self.achat_batch(repository, items))
+    
+    async def achat_batch(self, repository: ThreadRepository, items: list[dict]) -> list[dict]:
+        """
+        Answer several chat turns together.
         
-        # Extract response
+        Existing named threads are fetched in one query and the LLM calls run concurrently;
+        routing and saving stay sequential because they share the repository's session.
+        Turns in the same batch do not see each other's replies, even in the same thread.
+        
+        Args:
+            repository: Repository for the caller's database session
+            items: Dictionaries with user_id, message and optional thread_name
+        
+        Returns:
+            One achat-style result dictionary per item, in order
+        """
+        config = self._config(repository)
+        named = [(item["user_id"], item["thread_name"]) for item in items if item.get("thread_name")]
+        threads = {}
+        if named:
+            threads = await asyncio.to_thread(
+                repository.get_threads_for_users,
+                [user_id for user_id, _ in named],
+                [thread_name for _, thread_name in named]
+            )
+        
+        turns = []
+        for item in items:
+            state = self._initial_state(item["user_id"], item["message"], item.get("thread_name"))
+            if state["thread_name"]:
+                # Named threads were all looked up above; remember ones created here so
+                # later items naming the same thread reuse them
+                key = (state["user_id"], state["thread_name"])
+                threads[key] = await self._ensure_named_thread(
+                    repository, state["user_id"], state["thread_name"], threads.get(key)
+                )
+                self._apply_thread(state, threads[key])
+            else:
+                state = await self._route_message(state, config)
+            turns.append((state, await self._build_conversation(repository, state)))
+        
+        responses = await asyncio.gather(
+            *(self._complete(state, conversation_messages) for state, conversation_messages in turns)
+        )
+        
+        results = []
+        for (state, _), response in zip(turns, responses):
+            state["messages"].append(response)
+            results.append(self._result(await self._save_message(state, config)))
+        return results
+    
+    async def astream(
+        self, repository: ThreadRepository, user_id: str, message: str, thread_name: str = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Streaming chat interface.
+        
+        Yields Server-Sent Events: one {"delta": ...} event per token chunk, then a final
+        {"done": true, ...} event with thread information. The turn is persisted once the
+        LLM stream completes.
+        """
+        try:
+            state, conversation_messages = await self.prepare_turn(repository, user_id, message, thread_name)
+            thread_id = state["thread_id"]
+            
+            cache_key = ResponseCache.make_key(conversation_messages)
+            response_text = self._response_cache.get(cache_key)
+            if response_text is not None:
+                logger.debug(f"Response cache hit for thread {thread_id}")
+                yield self._sse({"delta": response_text})
+            else:
+                logger.debug(f"Streaming LLM response for thread {thread_id}")
+                chunks = []
+                async with self._llm_sem:
+                    async for chunk in self.llm.astream(conversation_messages, **self._llm_kwargs(thread_id)):
+                        if chunk.content:
+                            chunks.append(chunk.content)
+                            yield self._sse({"delta": chunk.content})
+                response_text = "".join(chunks)
+                self._response_cache.put(cache_key, response_text)
+            
+            state["messages"].append(AIMessage(content=response_text))
+            await self._save_message(state, self._config(repository))
+            
+            yield self._sse({
+                "done": True,
+                "thread_name": state["thread_name"],
+                "thread_id": thread_id
+            })
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logger.error(f"Error streaming chat response: {e}", exc_info=True)
+            yield self._sse({"error": str(e)})
+    
+    async def prepare_turn(
+        self, repository: ThreadRepository, user_id: str, message: str, thread_name: str = None
+    ) -> tuple[AgentState, list[BaseMessage]]:
+        """
+        Resolve the thread for a message and build the LLM input without calling the LLM.
+        
+        Used by callers that run the completion themselves (streaming, batch jobs).
+        """
+        state = await self._route_message(
+            self._initial_state(user_id, message, thread_name), self._config(repository)
+        )
+        return state, await self._build_conversation(repository, state)
+    
+    @staticmethod
+    def _result(final_state: AgentState) -> dict:
+        """Build the chat result for a finished turn."""
         assistant_messages = [msg for msg in final_state["messages"] if isinstance(msg, AIMessage)]
         response_text = assistant_messages[-1].content if assistant_messages else ""
         
@@ -233,4 +511,31 @@ class PersonaSwitchingAgent:
             "thread_id": final_state["thread_id"],
             "persona_prompt": final_state["persona_prompt"]
         }
+    
+    @staticmethod
+    def _sse(payload: dict) -> bytes:
+        """Format a payload as a Server-Sent Event."""
+        return b"data: " + orjson.dumps(payload) + b"\n\n"
+    
+    @staticmethod
+    def _initial_state(user_id: str, message: str, thread_name: Optional[str]) -> AgentState:
+        """Build the initial graph state for a user message."""
+        return {
+            "messages": [HumanMessage(content=message)],
+            "user_id": user_id,
+            "thread_name": thread_name or "",
+            "thread_id": 0,
+            "persona_prompt": "",
+            "thread_updated_at": None
+        }
+
+
+_agent: Optional[PersonaSwitchingAgent] = None
+
 
+def get_agent() -> PersonaSwitchingAgent:
+    """Get the process-wide agent, building its LLM client and graph on first use."""
+    global _agent
+    if _agent is None:
+        _agent = PersonaSwitchingAgent()
+    return _agent
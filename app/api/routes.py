@@ -2,10 +2,21 @@
 API route handlers.
 """
 from fastapi import APIRouter, HTTPException, Depends
-from app.api.schemas import ChatRequest, ChatResponse, ChatHistoryResponse
+from fastapi.responses import StreamingResponse
+from app.api.schemas import (
+    ChatRequest,
+    ChatResponse,
+    ChatHistoryResponse,
+    ChatBulkRequest,
+    ChatBulkResponse,
+    ChatBatchRequest,
+    ChatBatchResponse,
+    ChatBatchStatusResponse
+)
 from app.services.agent_service import AgentService
+from app.services.batch_service import BatchService
 from app.repositories.thread_repository import ThreadRepository
-from app.core.dependencies import get_agent_service, get_thread_repository
+from app.core.dependencies import get_agent_service, get_batch_service, get_thread_repository
 from app.core.exceptions import (
     ThreadNotFoundError,
     PersonaNotFoundError,
@@ -25,6 +36,10 @@ async def root():
         "message": "Persona-Switching AI Chatbot API",
         "endpoints": {
             "/chat": "POST - Send a message to the chatbot",
+            "/chat/stream": "POST - Send a message and stream the response as Server-Sent Events",
+            "/chat/bulk": "POST - Send several messages and get all responses at once",
+            "/chat/batch": "POST - Submit messages as an OpenAI batch job",
+            "/chat/batch/{batch_id}": "GET - Get the status of a batch job",
             "/chat_history": "GET - Get chat history for a user",
             "/health": "GET - Health check"
         }
@@ -56,7 +71,7 @@ async def chat(
     try:
         logger.info(f"Processing chat request for user_id: {request.user_id}")
         
-        result = agent_service.chat(
+        result = await agent_service.achat(
             user_id=request.user_id,
             message=request.message,
             thread_name=request.thread_name
@@ -86,6 +101,122 @@ async def chat(
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
 
 
+@router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    agent_service: AgentService = Depends(get_agent_service)
+):
+    """
+    Streaming chat endpoint.
+    
+    Same as /chat, but returns a text/event-stream of {"delta": ...} events as tokens
+    arrive, followed by a {"done": true, "thread_name": ..., "thread_id": ...} event.
+    """
+    try:
+        logger.info(f"Processing streaming chat request for user_id: {request.user_id}")
+        
+        stream = agent_service.astream_chat(
+            user_id=request.user_id,
+            message=request.message,
+            thread_name=request.thread_name
+        )
+        
+        return StreamingResponse(stream, media_type="text/event-stream")
+    except InvalidUserError as e:
+        logger.warning(f"Invalid user error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error in chat stream endpoint: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
+
+
+@router.post("/chat/bulk", response_model=ChatBulkResponse)
+async def chat_bulk(
+    request: ChatBulkRequest,
+    agent_service: AgentService = Depends(get_agent_service)
+):
+    """
+    Answer several chat turns in one request.
+    
+    Existing threads are looked up together and the LLM calls run concurrently.
+    Unlike /chat/batch, responses are returned immediately at the regular price.
+    """
+    try:
+        logger.info(f"Processing bulk chat request with {len(request.items)} items")
+        
+        results = await agent_service.achat_batch([item.model_dump() for item in request.items])
+        
+        return ChatBulkResponse(results=[
+            ChatResponse(
+                response=result["response"],
+                thread_name=result["thread_name"],
+                thread_id=result["thread_id"]
+            )
+            for result in results
+        ])
+    except InvalidUserError as e:
+        logger.warning(f"Invalid user error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except LLMError as e:
+        logger.error(f"LLM error: {e}")
+        raise HTTPException(status_code=500, detail=f"Error processing with LLM: {str(e)}")
+    except DatabaseError as e:
+        logger.error(f"Database error: {e}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        logger.error(f"Unexpected error in bulk chat endpoint: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
+
+
+@router.post("/chat/batch", response_model=ChatBatchResponse)
+async def submit_chat_batch(
+    request: ChatBatchRequest,
+    batch_service: BatchService = Depends(get_batch_service)
+):
+    """
+    Submit several chat turns as one OpenAI batch job.
+    
+    Batch jobs are billed at half price and complete within 24 hours. Replies are
+    saved to their threads once the batch finishes; use /chat/batch/{batch_id}
+    to follow progress.
+    """
+    try:
+        logger.info(f"Submitting chat batch with {len(request.items)} items")
+        
+        result = await batch_service.submit_batch([item.model_dump() for item in request.items])
+        BatchService.start_polling(result["batch_id"])
+        
+        return ChatBatchResponse(**result)
+    except InvalidUserError as e:
+        logger.warning(f"Invalid user error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except LLMError as e:
+        logger.error(f"LLM error: {e}")
+        raise HTTPException(status_code=500, detail=f"Error submitting batch: {str(e)}")
+    except DatabaseError as e:
+        logger.error(f"Database error: {e}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        logger.error(f"Unexpected error in chat batch endpoint: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error submitting batch: {str(e)}")
+
+
+@router.get("/chat/batch/{batch_id}", response_model=ChatBatchStatusResponse)
+async def get_chat_batch_status(
+    batch_id: str,
+    batch_service: BatchService = Depends(get_batch_service)
+):
+    """Get the status of a chat batch job."""
+    try:
+        return ChatBatchStatusResponse(**await batch_service.get_batch_status(batch_id))
+    except LLMError as e:
+        logger.error(f"LLM error: {e}")
+        raise HTTPException(status_code=500, detail=f"Error retrieving batch: {str(e)}")
+    except Exception as e:
+        logger.error(f"Unexpected error in chat batch status endpoint: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error retrieving batch: {str(e)}")
+
+
 @router.get("/chat_history", response_model=ChatHistoryResponse)
 async def get_chat_history(
     user_id: str,
@@ -19,6 +19,37 @@ class ChatResponse(BaseModel):
     thread_id: int = Field(..., description="Thread ID")
 
 
+class ChatBulkRequest(BaseModel):
+    """Request schema for bulk chat endpoint."""
+    items: List[ChatRequest] = Field(..., min_length=1, description="Chat turns to answer together")
+
+
+class ChatBulkResponse(BaseModel):
+    """Response schema for bulk chat endpoint."""
+    results: List[ChatResponse] = Field(..., description="One response per chat turn, in order")
+
+
+class ChatBatchRequest(BaseModel):
+    """Request schema for batch chat endpoint."""
+    items: List[ChatRequest] = Field(..., min_length=1, description="Chat turns to process as one batch")
+
+
+class ChatBatchResponse(BaseModel):
+    """Response schema for a submitted chat batch."""
+    batch_id: str = Field(..., description="OpenAI batch ID")
+    status: str = Field(..., description="Batch status")
+    request_count: int = Field(..., description="Number of chat turns in the batch")
+
+
+class ChatBatchStatusResponse(BaseModel):
+    """Response schema for chat batch status."""
+    batch_id: str
+    status: str
+    total: int
+    completed: int
+    failed: int
+
+
 class MessageSchema(BaseModel):
     """Schema for a single message."""
     role: str = Field(..., description="Message role (user or assistant)")
@@ -21,10 +21,23 @@ class Settings(BaseSettings):
     openai_api_key: Optional[str] = None
     model_name: str = "gpt-3.5-turbo"
     temperature: float = 0.7
+    enable_prompt_cache: bool = True  # Send a per-thread prompt_cache_key so OpenAI reuses cached prefixes
+    llm_max_concurrency: int = 8  # In-flight LLM calls per process
+    llm_max_retries: int = 6  # Retries (with exponential backoff) on rate limits and transient errors
+    batch_poll_interval: int = 60  # Seconds between OpenAI Batch API status checks
+    llm_max_connections: int = 100  # Shared HTTP connection pool size for LLM calls
+    llm_max_keepalive_connections: int = 50
+    
+    # Agent Configuration
+    history_cache_size: int = 1024  # Threads whose history is kept in memory
+    history_window_turns: int = 20  # Past user/assistant turns sent to the LLM (0 = all)
+    response_cache_size: int = 10000  # Cached responses for repeated prompts (0 = disabled)
     
     # Database Configuration
     database_url: str = "sqlite:///chatbot.db"
     database_echo: bool = False  # SQLAlchemy echo mode
+    database_pool_size: int = 20  # Pooled connections; ignored for in-memory SQLite
+    database_max_overflow: int = 10  # Extra connections beyond the pool; ignored for in-memory SQLite
     
     # Logging Configuration
     log_level: str = "INFO"
@@ -34,13 +47,22 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8000
     reload: bool = False
+    workers: int = 1  # Worker processes for run.py; forced to 1 when reload is on
     
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
         case_sensitive = False
+        frozen = True  # Settings are read-only after startup
 
 
 # Global settings instance
 settings = Settings()
 
+# Values read on every chat turn, bound once so the hot path skips model attribute access
+MODEL_NAME = settings.model_name
+TEMPERATURE = settings.temperature
+LLM_MAX_CONCURRENCY = settings.llm_max_concurrency
+HISTORY_WINDOW_TURNS = settings.history_window_turns
+ENABLE_PROMPT_CACHE = settings.enable_prompt_cache
+
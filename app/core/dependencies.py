@@ -5,6 +5,7 @@ from fastapi import Depends
 from sqlalchemy.orm import Session
 from app.repositories.thread_repository import ThreadRepository
 from app.services.agent_service import AgentService
+from app.services.batch_service import BatchService
 from app.core.config import settings
 from app.core.logging_config import logger
 
@@ -36,3 +37,9 @@ def get_agent_service(
         logger.error(f"Failed to initialize agent service: {e}")
         raise
 
+
+def get_batch_service(
+    agent_service: AgentService = Depends(get_agent_service)
+) -> BatchService:
+    """Get batch service instance."""
+    return BatchService(agent_service)
@@ -1,22 +1,46 @@
 """
 FastAPI application entry point.
 """
+import asyncio
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.logging_config import logger
 from app.core.error_handlers import register_error_handlers
 from app.models.database import init_db
+from app.agent.graph import get_agent
 from app.api.routes import router
+from app.services.batch_service import BatchService
+
+
+def _prebuild_agent():
+    """Build the shared agent (LLM client and graph) so the first chat request doesn't pay for it."""
+    if not (settings.openai_api_key or os.getenv("OPENAI_API_KEY")):
+        logger.warning("OPENAI_API_KEY not set; skipping agent warmup")
+        return
+    get_agent()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize the database and warm up the agent at startup; stop batch polling at shutdown."""
+    await asyncio.gather(
+        asyncio.to_thread(init_db),
+        asyncio.to_thread(_prebuild_agent)
+    )
+    logger.info("Application startup complete")
+    yield
+    await BatchService.stop_polling()
 
-# Initialize database
-init_db()
 
 # Create FastAPI app
 app = FastAPI(
     title=settings.api_title,
     description=settings.api_description,
-    version=settings.api_version
+    version=settings.api_version,
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -1,9 +1,13 @@
 """
 Database models and session management.
 """
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey
+import hashlib
+from sqlalchemy import (
+    create_engine, event, inspect, text, Column, Integer, String, Text, DateTime, ForeignKey, Index
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, Session
+from sqlalchemy.pool import StaticPool
 from datetime import datetime
 from typing import Generator
 from app.core.config import settings
@@ -12,19 +16,58 @@ from app.core.logging_config import logger
 Base = declarative_base()
 
 
+class Persona(Base):
+    """A persona system prompt, stored once and shared by every thread that uses it."""
+    __tablename__ = "personas"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)  # Thread name the prompt was first created for
+    prompt_hash = Column(String, unique=True, nullable=False)  # Lookup key for prompt_text
+    prompt_text = Column(Text, nullable=False)  # The system prompt for this persona
+    
+    @staticmethod
+    def hash_prompt(prompt_text: str) -> str:
+        """Hash a prompt for deduplication."""
+        return hashlib.blake2b(prompt_text.encode("utf-8"), digest_size=16).hexdigest()
+    
+    @classmethod
+    def from_prompt(cls, name: str, prompt_text: str) -> "Persona":
+        """Build a persona for a prompt."""
+        return cls(name=name, prompt_hash=cls.hash_prompt(prompt_text), prompt_text=prompt_text)
+    
+    def __repr__(self):
+        return f"<Persona(name={self.name})>"
+
+
 class UserThread(Base):
     """Represents a conversation thread for a user with a specific persona."""
     __tablename__ = "user_threads"
+    __table_args__ = (
+        Index("ix_user_thread", "user_id", "thread_name", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String, index=True, nullable=False)
     thread_name = Column(String, nullable=False)  # e.g., "mentor", "investor"
-    persona_prompt = Column(Text, nullable=False)  # The system prompt for this persona
+    persona_id = Column(Integer, ForeignKey("personas.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Persona is loaded in the same query as the thread
+    persona = relationship("Persona", lazy="joined", innerjoin=True)
+    
     # Relationship to messages
-    messages = relationship("ChatMessage", back_populates="thread", cascade="all, delete-orphan")
+    messages = relationship(
+        "ChatMessage",
+        back_populates="thread",
+        cascade="all, delete-orphan",
+        order_by="ChatMessage.timestamp"
+    )
+    
+    @property
+    def persona_prompt(self) -> str:
+        """The system prompt for this thread's persona."""
+        return self.persona.prompt_text
     
     def __repr__(self):
         return f"<UserThread(user_id={self.user_id}, thread_name={self.thread_name})>"
@@ -33,6 +76,9 @@ class UserThread(Base):
 class ChatMessage(Base):
     """Represents a single message in a conversation thread."""
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        Index("ix_thread_time", "thread_id", "timestamp"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     thread_id = Column(Integer, ForeignKey("user_threads.id"), nullable=False)
@@ -47,19 +93,100 @@ class ChatMessage(Base):
         return f"<ChatMessage(thread_id={self.thread_id}, role={self.role})>"
 
 
+def _engine_options(database_url: str) -> dict:
+    """Connection pool options for the configured database."""
+    if "sqlite" not in database_url:
+        return {
+            "pool_size": settings.database_pool_size,
+            "max_overflow": settings.database_max_overflow,
+            "pool_pre_ping": True
+        }
+    
+    options = {"connect_args": {"check_same_thread": False}}
+    if ":memory:" in database_url or database_url.rstrip("/") == "sqlite:":
+        # A single shared connection, otherwise every connection sees its own empty database
+        options["poolclass"] = StaticPool
+        return options
+    
+    # File databases use a QueuePool, which reuses connections without funnelling
+    # concurrent sessions through one sqlite3 connection
+    options["pool_size"] = settings.database_pool_size
+    options["max_overflow"] = settings.database_max_overflow
+    return options
+
+
 # Database engine and session factory
 engine = create_engine(
     settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {},
-    echo=settings.database_echo
+    echo=settings.database_echo,
+    **_engine_options(settings.database_url)
 )
 
+if "sqlite" in settings.database_url:
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """Use WAL with relaxed syncing and memory-mapped reads for every new connection."""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def _migrate_persona_prompts():
+    """Move per-thread persona prompts from databases created before the personas table."""
+    inspector = inspect(engine)
+    if "user_threads" not in inspector.get_table_names():
+        return
+    columns = {column["name"] for column in inspector.get_columns("user_threads")}
+    if "persona_prompt" not in columns:
+        return
+    
+    logger.info("Migrating thread persona prompts to the personas table")
+    with engine.begin() as conn:
+        if "persona_id" not in columns:
+            conn.execute(text(
+                "ALTER TABLE user_threads ADD COLUMN persona_id INTEGER REFERENCES personas(id)"
+            ))
+        
+        prompts = conn.execute(text(
+            "SELECT persona_prompt, MIN(thread_name) FROM user_threads GROUP BY persona_prompt"
+        )).all()
+        for prompt_text, name in prompts:
+            prompt_hash = Persona.hash_prompt(prompt_text)
+            persona_id = conn.execute(
+                text("SELECT id FROM personas WHERE prompt_hash = :hash"), {"hash": prompt_hash}
+            ).scalar()
+            if persona_id is None:
+                persona_id = conn.execute(
+                    Persona.__table__.insert().values(
+                        name=name, prompt_hash=prompt_hash, prompt_text=prompt_text
+                    )
+                ).inserted_primary_key[0]
+            conn.execute(
+                text("UPDATE user_threads SET persona_id = :persona_id WHERE persona_prompt = :prompt"),
+                {"persona_id": persona_id, "prompt": prompt_text}
+            )
+        
+        conn.execute(text("ALTER TABLE user_threads DROP COLUMN persona_prompt"))
+
+
 def init_db():
     """Initialize database tables."""
     Base.metadata.create_all(bind=engine)
+    _migrate_persona_prompts()
+    
+    # create_all skips tables that already exist, so add any missing indexes explicitly
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                logger.warning(f"Could not create index {index.name}: {e}")
+    
     logger.info("Database initialized")
 
 
@@ -1,10 +1,12 @@
 """
 Repository pattern for thread and message data access.
 """
-from sqlalchemy.orm import Session
-from typing import List, Optional, Dict
-from datetime import datetime
-from app.models.database import UserThread, ChatMessage
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional, Dict, Tuple
+from datetime import datetime, timedelta
+from app.models.database import Persona, UserThread, ChatMessage
 from app.core.exceptions import DatabaseError, ThreadNotFoundError
 from app.core.logging_config import logger
 
@@ -16,14 +18,29 @@ class ThreadRepository:
         self.session = session
     
     def create_thread(self, user_id: str, thread_name: str, persona_prompt: str) -> UserThread:
-        """Create a new conversation thread."""
+        """
+        Create a new conversation thread.
+        
+        If the user already has a thread with this name, e.g. one created by a concurrent
+        request after the caller's lookup, that thread is returned unchanged instead.
+        """
         try:
             thread = UserThread(
                 user_id=user_id,
                 thread_name=thread_name,
-                persona_prompt=persona_prompt
+                persona=self._get_or_create_persona(thread_name, persona_prompt)
             )
-            self.session.add(thread)
+            try:
+                # Insert under a SAVEPOINT so losing a race only undoes this insert
+                with self.session.begin_nested():
+                    self.session.add(thread)
+            except IntegrityError:
+                existing_thread = self.get_thread(user_id, thread_name)
+                if existing_thread is None:
+                    raise
+                self.session.commit()
+                logger.info(f"Thread {thread_name} for user {user_id} already exists; reusing {existing_thread.id}")
+                return existing_thread
             self.session.commit()
             self.session.refresh(thread)
             logger.info(f"Created thread {thread.id} for user {user_id} with name {thread_name}")
@@ -33,6 +50,27 @@ class ThreadRepository:
             logger.error(f"Error creating thread: {e}")
             raise DatabaseError(f"Failed to create thread: {str(e)}")
     
+    def _get_or_create_persona(self, name: str, prompt_text: str) -> Persona:
+        """Get the stored persona for a prompt, inserting it if it is new."""
+        prompt_hash = Persona.hash_prompt(prompt_text)
+        persona = self._find_persona(prompt_hash)
+        if persona:
+            return persona
+        
+        persona = Persona.from_prompt(name, prompt_text)
+        try:
+            # Insert under a SAVEPOINT so losing a race only undoes this insert
+            with self.session.begin_nested():
+                self.session.add(persona)
+        except IntegrityError:
+            # Another request stored the same prompt after the lookup above
+            persona = self._find_persona(prompt_hash)
+        return persona
+    
+    def _find_persona(self, prompt_hash: str) -> Optional[Persona]:
+        """Get the stored persona with a prompt hash."""
+        return self.session.query(Persona).filter(Persona.prompt_hash == prompt_hash).first()
+    
     def get_thread(self, user_id: str, thread_name: str) -> Optional[UserThread]:
         """Get a thread by user_id and thread_name."""
         try:
@@ -79,30 +117,94 @@ class ThreadRepository:
             logger.error(f"Error getting most recent thread: {e}")
             raise DatabaseError(f"Failed to get most recent thread: {str(e)}")
     
+    def get_threads_for_users(
+        self, user_ids: List[str], thread_names: List[str]
+    ) -> Dict[Tuple[str, str], UserThread]:
+        """
+        Get the named threads of several users in a single query.
+        
+        Returns the threads that exist, keyed by (user_id, thread_name).
+        """
+        if not user_ids or not thread_names:
+            return {}
+        try:
+            threads = self.session.query(UserThread).filter(
+                UserThread.user_id.in_(set(user_ids)),
+                UserThread.thread_name.in_(set(thread_names))
+            ).all()
+            return {(thread.user_id, thread.thread_name): thread for thread in threads}
+        except Exception as e:
+            logger.error(f"Error getting threads for users: {e}")
+            raise DatabaseError(f"Failed to get threads: {str(e)}")
+    
     def add_message(self, thread_id: int, role: str, content: str) -> ChatMessage:
-        """Add a message to a thread."""
+        """
+        Add a message to a thread.
+        
+        The returned message is a detached snapshot built from the INSERT ... RETURNING row.
+        """
         try:
-            message = ChatMessage(
-                thread_id=thread_id,
-                role=role,
-                content=content
-            )
-            self.session.add(message)
+            row = self.session.execute(
+                insert(ChatMessage).values(
+                    thread_id=thread_id,
+                    role=role,
+                    content=content
+                ).returning(ChatMessage.id, ChatMessage.timestamp)
+            ).one()
             
             # Update thread's updated_at timestamp
-            thread = self.session.query(UserThread).filter(UserThread.id == thread_id).first()
-            if thread:
-                thread.updated_at = datetime.utcnow()
+            self.session.execute(
+                update(UserThread).where(UserThread.id == thread_id).values(updated_at=datetime.utcnow())
+            )
             
             self.session.commit()
-            self.session.refresh(message)
             logger.debug(f"Added {role} message to thread {thread_id}")
-            return message
+            return ChatMessage(
+                id=row.id,
+                thread_id=thread_id,
+                role=role,
+                content=content,
+                timestamp=row.timestamp
+            )
         except Exception as e:
             self.session.rollback()
             logger.error(f"Error adding message: {e}")
             raise DatabaseError(f"Failed to add message: {str(e)}")
     
+    def add_messages_bulk(self, thread_id: int, messages: List[Tuple[str, str]]) -> datetime:
+        """
+        Add several (role, content) messages to a thread in a single transaction.
+        
+        Returns the thread's new updated_at timestamp.
+        """
+        try:
+            # History is ordered by timestamp, so give each message its own, strictly
+            # increasing one rather than relying on per-row defaults that can collide
+            now = datetime.utcnow()
+            self.session.add_all([
+                ChatMessage(
+                    thread_id=thread_id,
+                    role=role,
+                    content=content,
+                    timestamp=now + timedelta(microseconds=index)
+                )
+                for index, (role, content) in enumerate(messages)
+            ])
+            updated_at = now + timedelta(microseconds=max(len(messages) - 1, 0))
+            
+            # Update thread's updated_at timestamp
+            self.session.query(UserThread).filter(
+                UserThread.id == thread_id
+            ).update({"updated_at": updated_at})
+            
+            self.session.commit()
+            logger.debug(f"Added {len(messages)} messages to thread {thread_id}")
+            return updated_at
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"Error adding messages: {e}")
+            raise DatabaseError(f"Failed to add messages: {str(e)}")
+    
     def get_thread_messages(self, thread_id: int) -> List[ChatMessage]:
         """Get all messages for a thread, ordered by timestamp."""
         try:
@@ -113,14 +215,39 @@ class ThreadRepository:
             logger.error(f"Error getting thread messages: {e}")
             raise DatabaseError(f"Failed to get messages: {str(e)}")
     
+    def release_connection(self) -> None:
+        """
+        End the session's current transaction so its connection returns to the pool.
+        
+        Writes are committed as they happen, so this only discards the read transaction.
+        ORM objects loaded so far are expired and reload on next access.
+        """
+        self.session.rollback()
+    
+    def get_thread_history_tuples(self, thread_id: int) -> List[Tuple[str, str]]:
+        """Get (role, content) pairs for a thread, ordered by timestamp, without loading ORM objects."""
+        try:
+            return self.session.execute(
+                select(ChatMessage.role, ChatMessage.content).where(
+                    ChatMessage.thread_id == thread_id
+                ).order_by(ChatMessage.timestamp.asc())
+            ).all()
+        except Exception as e:
+            logger.error(f"Error getting thread history: {e}")
+            raise DatabaseError(f"Failed to get messages: {str(e)}")
+    
     def get_user_chat_history(self, user_id: str) -> Dict[str, Dict]:
         """Get all chat history for a user, organized by thread."""
         try:
-            threads = self.get_all_threads(user_id)
+            # Load all threads and their messages in two queries instead of one per thread
+            threads = self.session.query(UserThread).options(
+                selectinload(UserThread.messages)
+            ).filter(
+                UserThread.user_id == user_id
+            ).all()
             history = {}
             
             for thread in threads:
-                messages = self.get_thread_messages(thread.id)
                 history[thread.thread_name] = {
                     "thread_id": thread.id,
                     "persona_prompt": thread.persona_prompt,
@@ -132,7 +259,7 @@ class ThreadRepository:
                             "content": msg.content,
                             "timestamp": msg.timestamp.isoformat() if msg.timestamp else None
                         }
-                        for msg in messages
+                        for msg in thread.messages
                     ]
                 }
             
@@ -1,25 +1,28 @@
 """
 Service layer for agent orchestration.
 """
-from app.agent.graph import PersonaSwitchingAgent
+from typing import AsyncIterator, Dict, List
+from app.agent.graph import PersonaSwitchingAgent, get_agent
 from app.repositories.thread_repository import ThreadRepository
 from app.core.exceptions import InvalidUserError
 from app.core.logging_config import logger
 
 
+def _nonblank(value: str) -> bool:
+    """Check that a string has a non-whitespace character without copying it like strip() does."""
+    return bool(value) and not value.isspace()
+
+
 class AgentService:
     """Service for managing agent interactions."""
     
     def __init__(self, repository: ThreadRepository):
         self.repository = repository
-        self._agent = None
     
     @property
     def agent(self) -> PersonaSwitchingAgent:
-        """Lazy initialization of agent."""
-        if self._agent is None:
-            self._agent = PersonaSwitchingAgent(self.repository)
-        return self._agent
+        """The process-wide agent, built on first use."""
+        return get_agent()
     
     def chat(self, user_id: str, message: str, thread_name: str = None) -> dict:
         """
@@ -36,23 +39,122 @@ class AgentService:
         Raises:
             InvalidUserError: If user_id is invalid
         """
-        if not user_id or not user_id.strip():
-            raise InvalidUserError("user_id cannot be empty")
-        
-        if not message or not message.strip():
-            raise InvalidUserError("message cannot be empty")
+        self.validate_message(user_id, message)
         
-        logger.info(f"Processing chat for user_id: {user_id}, thread_name: {thread_name}")
+        # Lazy %-style arguments: messages are only formatted if the log level emits them
+        logger.info("Processing chat for user_id: %s, thread_name: %s", user_id, thread_name)
         
         try:
             result = self.agent.chat(
+                repository=self.repository,
                 user_id=user_id,
                 message=message,
                 thread_name=thread_name
             )
-            logger.info(f"Chat completed for user_id: {user_id}, thread: {result['thread_name']}")
+            logger.info("Chat completed for user_id: %s, thread: %s", user_id, result["thread_name"])
             return result
         except Exception as e:
-            logger.error(f"Error in agent service chat: {e}", exc_info=True)
+            logger.error("Error in agent service chat: %s", e, exc_info=True)
             raise
-
+    
+    async def achat(self, user_id: str, message: str, thread_name: str = None) -> dict:
+        """
+        Process a chat message without blocking the event loop.
+        
+        Args:
+            user_id: User identifier
+            message: User's message
+            thread_name: Optional thread name to use
+        
+        Returns:
+            Dictionary with response and thread information
+        
+        Raises:
+            InvalidUserError: If user_id is invalid
+        """
+        self.validate_message(user_id, message)
+        
+        logger.info("Processing chat for user_id: %s, thread_name: %s", user_id, thread_name)
+        
+        try:
+            result = await self.agent.achat(
+                repository=self.repository,
+                user_id=user_id,
+                message=message,
+                thread_name=thread_name
+            )
+            logger.info("Chat completed for user_id: %s, thread: %s", user_id, result["thread_name"])
+            return result
+        except Exception as e:
+            logger.error("Error in agent service chat: %s", e, exc_info=True)
+            raise
+    
+    def chat_batch(self, items: List[Dict]) -> List[Dict]:
+        """
+        Process several chat messages together.
+        
+        Args:
+            items: Dictionaries with user_id, message and optional thread_name
+        
+        Returns:
+            One result dictionary per item, in order
+        
+        Raises:
+            InvalidUserError: If any item has an empty user_id or message
+        """
+        for item in items:
+            self.validate_message(item.get("user_id"), item.get("message"))
+        
+        logger.info("Processing chat batch with %d items", len(items))
+        
+        try:
+            return self.agent.chat_batch(repository=self.repository, items=items)
+        except Exception as e:
+            logger.error("Error in agent service chat batch: %s", e, exc_info=True)
+            raise
+    
+    async def achat_batch(self, items: List[Dict]) -> List[Dict]:
+        """
+        Process several chat messages together without blocking the event loop.
+        
+        See chat_batch for details.
+        """
+        for item in items:
+            self.validate_message(item.get("user_id"), item.get("message"))
+        
+        logger.info("Processing chat batch with %d items", len(items))
+        
+        try:
+            return await self.agent.achat_batch(repository=self.repository, items=items)
+        except Exception as e:
+            logger.error("Error in agent service chat batch: %s", e, exc_info=True)
+            raise
+    
+    def astream_chat(self, user_id: str, message: str, thread_name: str = None) -> AsyncIterator[bytes]:
+        """
+        Stream a chat response as Server-Sent Events.
+        
+        Input is validated eagerly so errors surface before the response starts.
+        
+        Raises:
+            InvalidUserError: If user_id is invalid
+        """
+        self.validate_message(user_id, message)
+        
+        logger.info("Streaming chat for user_id: %s, thread_name: %s", user_id, thread_name)
+        
+        return self.agent.astream(
+            repository=self.repository,
+            user_id=user_id,
+            message=message,
+            thread_name=thread_name
+        )
+    
+    @staticmethod
+    def validate_message(user_id: str, message: str) -> None:
+        """Validate chat input."""
+        if not _nonblank(user_id):
+            raise InvalidUserError("user_id cannot be empty")
+        
+        if not _nonblank(message):
+            raise InvalidUserError("message cannot be empty")
@@ -0,0 +1,240 @@
+"""
+Service for running non-interactive chat turns through the OpenAI Batch API.
+"""
+import asyncio
+import os
+from typing import Dict, List, Optional, Set
+import orjson
+from openai import AsyncOpenAI
+from langchain_core.messages import BaseMessage
+from app.services.agent_service import AgentService
+from app.repositories.thread_repository import ThreadRepository
+from app.core.config import settings, MODEL_NAME, TEMPERATURE
+from app.core.exceptions import ConfigurationError, LLMError
+from app.core.logging_config import logger
+
+# Batch statuses after which OpenAI will not change the batch any more
+TERMINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+# LangChain message type -> OpenAI chat role
+_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+_client: Optional[AsyncOpenAI] = None
+
+# Running poll_and_persist tasks. The event loop only keeps weak references to tasks,
+# so they are held here until they finish.
+_poll_tasks: Set[asyncio.Task] = set()
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """Get the shared OpenAI client used for batch jobs."""
+    global _client
+    if _client is None:
+        api_key = settings.openai_api_key or os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ConfigurationError(
+                "OPENAI_API_KEY not found. Please set it in environment variables or .env file"
+            )
+        _client = AsyncOpenAI(api_key=api_key, max_retries=settings.llm_max_retries)
+    return _client
+
+
+class BatchService:
+    """
+    Submits chat turns as an OpenAI batch job and persists the results.
+    
+    Batch jobs cost half as much as interactive calls but complete within 24 hours,
+    so they suit bulk evaluations and back-filling threads. Turns in the same batch
+    do not see each other's replies, even when they target the same thread.
+    """
+    
+    def __init__(self, agent_service: AgentService, client: Optional[AsyncOpenAI] = None):
+        self.agent_service = agent_service
+        self._client = client
+    
+    @property
+    def client(self) -> AsyncOpenAI:
+        """Lazy initialization of the OpenAI client."""
+        if self._client is None:
+            self._client = get_openai_client()
+        return self._client
+    
+    async def submit_batch(self, items: List[Dict]) -> Dict:
+        """
+        Submit chat turns as a single batch job.
+        
+        Args:
+            items: Dictionaries with user_id, message and optional thread_name
+        
+        Returns:
+            Dictionary with the batch id, its status and the number of requests
+        
+        Raises:
+            InvalidUserError: If any item has an empty user_id or message
+            LLMError: If the batch could not be submitted
+        """
+        for item in items:
+            self.agent_service.validate_message(item.get("user_id"), item.get("message"))
+        
+        lines = []
+        for index, item in enumerate(items):
+            state, conversation_messages = await self.agent_service.agent.prepare_turn(
+                self.agent_service.repository,
+                user_id=item["user_id"],
+                message=item["message"],
+                thread_name=item.get("thread_name")
+            )
+            lines.append(orjson.dumps({
+                "custom_id": f"{state['thread_id']}-{index}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": MODEL_NAME,
+                    "temperature": TEMPERATURE,
+                    "messages": self._to_openai_messages(conversation_messages)
+                }
+            }))
+        
+        try:
+            input_file = await self.client.files.create(
+                file=("chat_batch.jsonl", b"\n".join(lines)),
+                purpose="batch"
+            )
+            batch = await self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+        except Exception as e:
+            logger.error(f"Error submitting chat batch: {e}")
+            raise LLMError(f"Failed to submit batch: {str(e)}")
+        
+        logger.info(f"Submitted chat batch {batch.id} with {len(lines)} requests")
+        return {
+            "batch_id": batch.id,
+            "status": batch.status,
+            "request_count": len(lines)
+        }
+    
+    async def get_batch_status(self, batch_id: str) -> Dict:
+        """Get the status and request counts of a batch job."""
+        try:
+            batch = await self.client.batches.retrieve(batch_id)
+        except Exception as e:
+            logger.error(f"Error retrieving chat batch {batch_id}: {e}")
+            raise LLMError(f"Failed to retrieve batch: {str(e)}")
+        
+        counts = batch.request_counts
+        return {
+            "batch_id": batch.id,
+            "status": batch.status,
+            "total": counts.total if counts else 0,
+            "completed": counts.completed if counts else 0,
+            "failed": counts.failed if counts else 0
+        }
+    
+    @staticmethod
+    def start_polling(batch_id: str) -> asyncio.Task:
+        """
+        Poll a batch job in the background until it finishes and save its turns.
+        
+        The task is independent of the submitting request, so the response is not held
+        open while the batch runs (which can take up to 24 hours).
+        """
+        task = asyncio.create_task(BatchService.poll_and_persist(batch_id))
+        _poll_tasks.add(task)
+        task.add_done_callback(_poll_tasks.discard)
+        return task
+    
+    @staticmethod
+    async def stop_polling() -> None:
+        """Cancel outstanding polling tasks, e.g. at application shutdown."""
+        for task in list(_poll_tasks):
+            task.cancel()
+        await asyncio.gather(*_poll_tasks, return_exceptions=True)
+    
+    @staticmethod
+    async def poll_and_persist(batch_id: str, client: Optional[AsyncOpenAI] = None) -> None:
+        """
+        Wait for a batch job to finish and save its turns to their threads.
+        
+        Runs as a background task after the submitting request has completed, so it
+        opens its own database session. If it is cancelled before the batch finishes, the
+        results are not saved.
+        """
+        client = client or get_openai_client()
+        
+        try:
+            batch = await client.batches.retrieve(batch_id)
+            while batch.status not in TERMINAL_STATUSES:
+                await asyncio.sleep(settings.batch_poll_interval)
+                batch = await client.batches.retrieve(batch_id)
+            
+            if not batch.output_file_id:
+                logger.warning(f"Chat batch {batch_id} ended with status {batch.status} and no output")
+                return
+            
+            input_text = (await client.files.content(batch.input_file_id)).text
+            output_text = (await client.files.content(batch.output_file_id)).text
+        except asyncio.CancelledError:
+            logger.warning(f"Stopped polling chat batch {batch_id}; its results will not be saved")
+            raise
+        except Exception as e:
+            logger.error(f"Error polling chat batch {batch_id}: {e}", exc_info=True)
+            return
+        
+        try:
+            # Database writes are blocking, so they run in a worker thread
+            saved = await asyncio.to_thread(BatchService._persist_in_new_session, input_text, output_text)
+            logger.info(f"Saved {saved} turns from chat batch {batch_id}")
+        except Exception as e:
+            logger.error(f"Error saving chat batch {batch_id}: {e}", exc_info=True)
+    
+    @staticmethod
+    def _persist_in_new_session(input_text: str, output_text: str) -> int:
+        """Save batch results using a session owned by the calling thread."""
+        from app.models.database import SessionLocal
+        session = SessionLocal()
+        try:
+            return BatchService.persist_results(ThreadRepository(session), input_text, output_text)
+        finally:
+            session.close()
+    
+    @staticmethod
+    def persist_results(repository: ThreadRepository, input_text: str, output_text: str) -> int:
+        """
+        Save successful batch responses alongside their user messages.
+        
+        Returns the number of turns saved.
+        """
+        user_messages = {}
+        for line in input_text.splitlines():
+            if line.strip():
+                request = orjson.loads(line)
+                user_messages[request["custom_id"]] = request["body"]["messages"][-1]["content"]
+        
+        saved = 0
+        for line in output_text.splitlines():
+            if not line.strip():
+                continue
+            result = orjson.loads(line)
+            custom_id = result["custom_id"]
+            response = result.get("response") or {}
+            if response.get("status_code") != 200 or custom_id not in user_messages:
+                logger.warning(f"Skipping failed batch request {custom_id}")
+                continue
+            
+            thread_id = int(custom_id.split("-", 1)[0])
+            assistant_content = response["body"]["choices"][0]["message"]["content"]
+            repository.add_messages_bulk(
+                thread_id,
+                [("user", user_messages[custom_id]), ("assistant", assistant_content)]
+            )
+            saved += 1
+        
+        return saved
+    
+    @staticmethod
+    def _to_openai_messages(messages: List[BaseMessage]) -> List[Dict]:
+        """Convert LangChain messages to Chat Completions message dicts."""
+        return [{"role": _ROLES[msg.type], "content": msg.content} for msg in messages]
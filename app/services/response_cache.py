@@ -0,0 +1,37 @@
+"""
+In-memory cache of LLM responses for repeated prompts.
+"""
+import hashlib
+from typing import Optional, Sequence
+from cachetools import LRUCache
+from langchain_core.messages import BaseMessage
+
+
+class ResponseCache:
+    """Exact-match LRU cache of assistant responses."""
+    
+    def __init__(self, maxsize: int):
+        self._cache: Optional[LRUCache] = LRUCache(maxsize=maxsize) if maxsize > 0 else None
+    
+    @staticmethod
+    def make_key(messages: Sequence[BaseMessage]) -> str:
+        """
+        Build a cache key from the full LLM input.
+        
+        The cache is shared by all users, so the key covers every message sent to the
+        LLM (persona prompt, history window and current message); a shorter key would
+        return a reply written for another conversation's context.
+        """
+        payload = "\x1e".join(f"{msg.type}\x1f{msg.content}" for msg in messages)
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached response, or None on a miss."""
+        if self._cache is None:
+            return None
+        return self._cache.get(key)
+    
+    def put(self, key: str, value: str) -> None:
+        """Store a response."""
+        if self._cache is not None:
+            self._cache[key] = value
@@ -1,14 +1,44 @@
 """
 Persona management system for handling base meta-persona and dynamic persona switching.
 """
-from typing import Optional, Dict
+from functools import lru_cache
 import re
+import sys
+from typing import Dict, Final, FrozenSet, Optional, Tuple
 
+# Patterns for persona switching, fused into one alternation so a message is scanned
+# once. Alternatives are in priority order and each has a single named group holding
+# the persona name. Persona keywords are ASCII, so re.ASCII keeps \w to a small
+# byte-class table.
+_PERSONA_PATTERNS = re.compile("|".join((
+    r"act like (?:my |an? )?(?P<act_like>\w+)",
+    r"be (?:my |an? )?(?P<be>\w+)",
+    r"switch to (?:my |the )?(?P<switch_to>\w+)",
+    r"(?P<persona>\w+) persona",
+    r"(?P<thread>\w+) thread",
+    r"back to (?:my |the )?(?P<back_to>\w+)",
+)), re.ASCII)
 
-class PersonaManager:
-    """Manages persona creation and switching logic."""
-    
-    BASE_META_PROMPT = """You are a Business Domain Expert - a versatile professional capable of 
+# Phrases that request a switch back to an existing thread. They are plain literals,
+# so a substring search is enough.
+_SWITCH_LITERALS = ("back to", "switch to", "return to", "go back to", "resume", "continue with")
+
+# Literals at least one of which appears in any persona match. Checking them with a
+# plain substring search skips the regex for the common no-trigger message.
+_TRIGGER_KWS = ("act like", "be ", "switch to", "persona", "thread", "back to")
+
+# Common words captured by the persona patterns that aren't personas
+_STOPWORDS: Final[FrozenSet[str]] = frozenset({"the", "a", "an", "my", "your", "this", "that"})
+
+# ASCII translation table for thread names: uppercase -> lowercase, space -> underscore,
+# [a-z0-9_] kept, everything else removed
+_NORM_TABLE = {code: None for code in range(0x80)}
+_NORM_TABLE.update({ord(c): ord(c) for c in "abcdefghijklmnopqrstuvwxyz0123456789_"})
+_NORM_TABLE.update({ord(c): ord(c.lower()) for c in "ABCDEFGHIJKLMNOPQRSTUVWXYZ"})
+_NORM_TABLE[ord(" ")] = ord("_")
+
+
+BASE_META_PROMPT: Final[str] = """You are a Business Domain Expert - a versatile professional capable of 
 adapting to various business contexts and roles. You have deep knowledge across multiple domains 
 including entrepreneurship, investment, strategy, operations, and leadership.
 
@@ -23,73 +53,106 @@ you should seamlessly transition into that role while maintaining your core expe
 conversation exists in its own thread, allowing you to maintain context-specific knowledge and 
 conversation history."""
 
-    # Common persona templates
-    PERSONA_TEMPLATES = {
-        "mentor": """You are an experienced business mentor with decades of experience guiding 
+# Common persona templates. Keys are interned so lookups with interned persona names
+# can short-circuit on identity.
+_PERSONA_TEMPLATES: Final[Dict[str, str]] = {sys.intern(k): v for k, v in {
+    "mentor": """You are an experienced business mentor with decades of experience guiding 
 entrepreneurs and business leaders. Your approach is supportive, insightful, and focused on 
 long-term growth. You ask probing questions to help the mentee think deeply about their challenges, 
 and you provide actionable advice based on real-world experience. You care about the person's 
 overall development, not just immediate business outcomes.""",
-        
-        "investor": """You are a seasoned venture capitalist and investor with a skeptical, 
+    
+    "investor": """You are a seasoned venture capitalist and investor with a skeptical, 
 analytical mindset. You evaluate business opportunities based on market size, competitive 
 advantage, unit economics, scalability, and team strength. You ask tough questions about TAM 
 (Total Addressable Market), business model, traction, and defensibility. You're direct, 
 data-driven, and focused on investment returns. You challenge assumptions and look for potential 
 risks and red flags.""",
-        
-        "advisor": """You are a strategic business advisor specializing in helping companies 
+    
+    "advisor": """You are a strategic business advisor specializing in helping companies 
 scale and optimize their operations. You focus on practical, implementable solutions. You analyze 
 business processes, identify bottlenecks, and recommend improvements. Your advice is grounded in 
 industry best practices and proven methodologies.""",
-        
-        "coach": """You are a business coach focused on leadership development and personal 
+    
+    "coach": """You are a business coach focused on leadership development and personal 
 growth. You help leaders develop their skills, overcome challenges, and achieve their goals. 
 You use a combination of questioning, feedback, and structured frameworks to guide development.""",
-    }
+}.items()}
+
+
+# Prompt for personas without a template, split around the persona name
+_GENERIC_PROMPT_PRE: Final[str] = "You are now acting as a "
+_GENERIC_PROMPT_POST: Final[str] = """ in a business context. 
+You should adopt the characteristics, communication style, and expertise typical of this role. 
+Provide advice, ask questions, and engage in conversation as this persona would, while maintaining 
+your core business expertise. Be authentic to this role while being helpful and constructive."""
+
+
+class PersonaManager:
+    """Manages persona creation and switching logic."""
+    
+    # Class-level aliases of the module constants
+    BASE_META_PROMPT = BASE_META_PROMPT
+    PERSONA_TEMPLATES = _PERSONA_TEMPLATES
     
     @staticmethod
     def extract_persona_request(message: str) -> Optional[str]:
         """
         Extract persona request from user message.
         Returns the persona name if found, None otherwise.
-        """
-        message_lower = message.lower()
-        
-        # Patterns for persona switching
-        patterns = [
-            r"act like (?:my |an? )?(\w+)",
-            r"be (?:my |an? )?(\w+)",
-            r"switch to (?:my |the )?(\w+)",
-            r"(\w+) persona",
-            r"(\w+) thread",
-            r"back to (?:my |the )?(\w+)",
-        ]
         
-        for pattern in patterns:
-            match = re.search(pattern, message_lower)
-            if match:
-                persona_name = match.group(1)
-                # Filter out common words that aren't personas
-                if persona_name not in ["the", "a", "an", "my", "your", "this", "that"]:
-                    return persona_name
-        
-        return None
+        Only ASCII persona names are detected; other personas can be set up with
+        get_persona_prompt's custom_prompt.
+        """
+        return PersonaManager._extract(_lower(message))
     
     @staticmethod
     def is_thread_switch_request(message: str) -> bool:
         """Check if message is requesting to switch to an existing thread."""
-        message_lower = message.lower()
-        switch_patterns = [
-            r"back to",
-            r"switch to",
-            r"return to",
-            r"go back to",
-            r"resume",
-            r"continue with",
-        ]
+        return PersonaManager._is_switch(_lower(message))
+    
+    @staticmethod
+    def analyze_message(message: str) -> Tuple[Optional[str], bool]:
+        """
+        Extract the persona request and thread switch flag in one pass.
         
-        return any(re.search(pattern, message_lower) for pattern in switch_patterns)
+        Lowercases the message once and shares it between both checks.
+        """
+        message_lower = _lower(message)
+        return PersonaManager._extract(message_lower), PersonaManager._is_switch(message_lower)
+    
+    @staticmethod
+    def _extract(message_lower: str) -> Optional[str]:
+        """Extract a persona name from an already lowercased message."""
+        if not any(kw in message_lower for kw in _TRIGGER_KWS):
+            return None
+        
+        # Earlier alternatives take priority wherever they appear in the message, as when
+        # each pattern was searched in turn; only a pattern's first match counts. Group
+        # numbers follow pattern order, so lastindex is the alternative's rank.
+        best_name, best_rank = None, None
+        seen_ranks = set()
+        for match in _PERSONA_PATTERNS.finditer(message_lower):
+            rank = match.lastindex
+            if rank in seen_ranks:
+                continue
+            seen_ranks.add(rank)
+            
+            persona_name = match.group(rank)
+            # Filter out common words that aren't personas
+            if persona_name in _STOPWORDS:
+                continue
+            if rank == 1:
+                return persona_name
+            if best_rank is None or rank < best_rank:
+                best_name, best_rank = persona_name, rank
+        
+        return best_name
+    
+    @staticmethod
+    def _is_switch(message_lower: str) -> bool:
+        """Check an already lowercased message for thread switch phrases."""
+        return any(phrase in message_lower for phrase in _SWITCH_LITERALS)
     
     @staticmethod
     def get_persona_prompt(persona_name: str, custom_prompt: Optional[str] = None) -> str:
@@ -100,24 +163,45 @@ You use a combination of questioning, feedback, and structured frameworks to gui
         if custom_prompt:
             return custom_prompt
         
-        persona_lower = persona_name.lower()
-        
-        # Check if we have a template
-        if persona_lower in PersonaManager.PERSONA_TEMPLATES:
-            return PersonaManager.PERSONA_TEMPLATES[persona_lower]
-        
-        # Generate a generic persona prompt
-        return f"""You are now acting as a {persona_name} in a business context. 
-You should adopt the characteristics, communication style, and expertise typical of this role. 
-Provide advice, ask questions, and engage in conversation as this persona would, while maintaining 
-your core business expertise. Be authentic to this role while being helpful and constructive."""
+        return _get_persona_prompt_cached(persona_name)
     
     @staticmethod
     def normalize_thread_name(persona_name: str) -> str:
         """Normalize persona name to a consistent thread name format."""
-        # Convert to lowercase and replace spaces with underscores
-        normalized = persona_name.lower().strip().replace(" ", "_")
-        # Remove special characters
-        normalized = re.sub(r'[^a-z0-9_]', '', normalized)
-        return normalized
+        return _normalize_thread_name_cached(persona_name)
+
+
+def _lower(message: str) -> str:
+    """Lowercase a message, reusing it as is when it has no uppercase characters."""
+    # islower() scans without allocating; lower() always builds a new string
+    return message if message.islower() else message.lower()
 
+
+# Both lookups are pure functions of a small, repeated set of persona names,
+# so they are memoized at module level (lru_cache does not wrap staticmethods cleanly)
+@lru_cache(maxsize=512)
+def _get_persona_prompt_cached(persona_name: str) -> str:
+    """Get the template or generic system prompt for a persona."""
+    persona_lower = persona_name.lower()
+    
+    # Check if we have a template (keys are lowercase)
+    template = _PERSONA_TEMPLATES.get(persona_lower)
+    if template is not None:
+        return template
+    
+    # Generate a generic persona prompt
+    return _GENERIC_PROMPT_PRE + persona_name + _GENERIC_PROMPT_POST
+
+
+@lru_cache(maxsize=512)
+def _normalize_thread_name_cached(persona_name: str) -> str:
+    """Normalize persona name to a consistent thread name format."""
+    # ASCII names are lowercased, underscored and filtered in a single pass
+    if persona_name.isascii():
+        return persona_name.strip().translate(_NORM_TABLE)
+    
+    # Convert to lowercase and replace spaces with underscores
+    normalized = persona_name.lower().strip().replace(" ", "_")
+    # Remove special characters
+    normalized = re.sub(r'[^a-z0-9_]', '', normalized)
+    return normalized
@@ -2,16 +2,22 @@
 Entry point for running the application.
 This is a convenience script that can be used instead of: python -m app.main
 """
+import sys
 import uvicorn
 from app.core.config import settings
 from app.core.logging_config import logger
 
 if __name__ == "__main__":
-    logger.info(f"Starting server on {settings.host}:{settings.port}")
+    # uvicorn cannot combine auto-reload with multiple workers
+    workers = 1 if settings.reload else settings.workers
+    logger.info(f"Starting server on {settings.host}:{settings.port} with {workers} worker(s)")
     uvicorn.run(
         "app.main:app",
         host=settings.host,
         port=settings.port,
-        reload=settings.reload
+        reload=settings.reload,
+        workers=workers,
+        # uvloop is not available on Windows
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools"
     )
-
@@ -2,25 +2,53 @@
 Pytest configuration and fixtures.
 """
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
-from app.models.database import Base, UserThread, ChatMessage
+from sqlalchemy.pool import StaticPool
+from app.models.database import Base, Persona, UserThread, ChatMessage
 from app.repositories.thread_repository import ThreadRepository
 from app.services.agent_service import AgentService
 
+# Commits inside a test only release a SAVEPOINT, so test_db's outer rollback undoes everything
+_SessionLocal = sessionmaker(autoflush=False, join_transaction_mode="create_savepoint")
 
-@pytest.fixture
-def test_db():
-    """Create a test database."""
-    engine = create_engine("sqlite:///:memory:")
+
+@pytest.fixture(scope="session")
+def engine():
+    """Create the test database schema once for the whole run."""
+    # StaticPool keeps a single connection so worker threads see the same in-memory database
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    
+    # pysqlite's own transaction handling breaks SAVEPOINTs, so let SQLAlchemy emit BEGIN
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+    
+    @event.listens_for(engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+    
     Base.metadata.create_all(bind=engine)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    session = SessionLocal()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def test_db(engine):
+    """Create a test database session that is rolled back after the test."""
+    connection = engine.connect()
+    transaction = connection.begin()
+    session = _SessionLocal(bind=connection)
     try:
         yield session
     finally:
         session.close()
-        Base.metadata.drop_all(bind=engine)
+        transaction.rollback()
+        connection.close()
 
 
 @pytest.fixture
@@ -43,7 +71,7 @@ def sample_thread(test_db):
     thread = UserThread(
         user_id="test_user",
         thread_name="mentor",
-        persona_prompt="You are a mentor."
+        persona=Persona.from_prompt("mentor", "You are a mentor.")
     )
     test_db.add(thread)
     test_db.commit()
@@ -0,0 +1,316 @@
+"""
+Tests for the persona-switching agent.
+"""
+import asyncio
+import json
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.agent import graph
+from app.agent.graph import PersonaSwitchingAgent
+from app.models.database import Base
+from app.repositories.thread_repository import ThreadRepository
+from app.services.agent_service import AgentService
+from app.utils.persona_manager import BASE_META_PROMPT
+
+
+class RecordingChatModel(FakeListChatModel):
+    """Fake chat model that records the messages it was called with."""
+    sent: list = []
+    
+    async def ainvoke(self, input, *args, **kwargs):
+        self.sent.append([m.content for m in input])
+        return await super().ainvoke(input, *args, **kwargs)
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    """Create an agent backed by a fake LLM."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    agent = PersonaSwitchingAgent()
+    agent.llm = RecordingChatModel(responses=["First reply", "Second reply", "Third reply"], sent=[])
+    return agent
+
+
+@pytest.mark.asyncio
+async def test_achat_creates_persona_thread(agent, repository):
+    """Test that a persona request creates a thread and persists the turn."""
+    result = await agent.achat(repository, "test_user", "act like my mentor")
+    
+    assert result["response"] == "First reply"
+    assert result["thread_name"] == "mentor"
+    
+    messages = repository.get_thread_messages(result["thread_id"])
+    assert [(m.role, m.content) for m in messages] == [
+        ("user", "act like my mentor"),
+        ("assistant", "First reply"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_achat_continues_explicit_thread(agent, repository):
+    """Test that an explicit thread name keeps the conversation in that thread."""
+    first = await agent.achat(repository, "test_user", "Hello", thread_name="ideas")
+    second = await agent.achat(repository, "test_user", "Tell me more", thread_name="ideas")
+    
+    assert first["thread_id"] == second["thread_id"]
+    assert second["response"] == "Second reply"
+    assert len(repository.get_thread_messages(second["thread_id"])) == 4
+
+
+@pytest.mark.asyncio
+async def test_history_cache_tracks_thread_updates(agent, repository):
+    """Test that cached history is extended per turn and refreshed after outside writes."""
+    first = await agent.achat(repository, "test_user", "Hello", thread_name="ideas")
+    thread_id = first["thread_id"]
+    await agent.achat(repository, "test_user", "Tell me more", thread_name="ideas")
+    
+    cached_history = agent._history_cache[thread_id][1]
+    assert [m.content for m in cached_history] == [
+        "Hello", "First reply", "Tell me more", "Second reply"
+    ]
+    
+    # A write that bypasses the agent makes the cached entry stale
+    repository.add_message(thread_id, "user", "Written elsewhere")
+    await agent.achat(repository, "test_user", "And now?", thread_name="ideas")
+    
+    cached_history = agent._history_cache[thread_id][1]
+    assert [m.content for m in cached_history][4:] == [
+        "Written elsewhere", "And now?", "Third reply"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_history_window_limits_llm_context(agent, repository, monkeypatch):
+    """Test that only the configured number of past turns is sent to the LLM."""
+    monkeypatch.setattr(graph, "HISTORY_WINDOW_TURNS", 1)
+    
+    await agent.achat(repository, "test_user", "One", thread_name="ideas")
+    await agent.achat(repository, "test_user", "Two", thread_name="ideas")
+    await agent.achat(repository, "test_user", "Three", thread_name="ideas")
+    
+    # System prompt, one previous turn, then the current message
+    assert agent.llm.sent[-1][1:] == ["Two", "Second reply", "Three"]
+
+
+@pytest.mark.asyncio
+async def test_response_cache_reuses_identical_exchange(agent, repository):
+    """Test that an identical prompt in the same persona is answered from the cache."""
+    first = await agent.achat(repository, "user_one", "act like my mentor")
+    second = await agent.achat(repository, "user_two", "act like my mentor")
+    
+    # Both new threads send exactly the same prompt: persona, no history, same message
+    assert first["thread_id"] != second["thread_id"]
+    assert second["response"] == first["response"] == "First reply"
+    assert len(agent.llm.sent) == 1
+
+
+@pytest.mark.asyncio
+async def test_response_cache_keys_on_full_history(agent, repository):
+    """Test that matching recent messages do not reuse a reply written for other history."""
+    alice = repository.create_thread("alice", "t", BASE_META_PROMPT)
+    repository.add_messages_bulk(alice.id, [
+        ("user", "My revenue is $5M, keep it secret"), ("assistant", "Noted"),
+        ("user", "hi"), ("assistant", "Hello"),
+    ])
+    bob = repository.create_thread("bob", "t", BASE_META_PROMPT)
+    repository.add_messages_bulk(bob.id, [("user", "hi"), ("assistant", "Hello")])
+    
+    first = await agent.achat(repository, "alice", "summarize what I told you", thread_name="t")
+    second = await agent.achat(repository, "bob", "summarize what I told you", thread_name="t")
+    
+    assert len(agent.llm.sent) == 2
+    assert first["response"] != second["response"]
+
+
+@pytest.mark.asyncio
+async def test_astream_yields_deltas_and_persists_turn(agent, repository):
+    """Test that streaming emits token events, a final event, and saves the turn."""
+    events = [event async for event in agent.astream(repository, "test_user", "Hello", thread_name="ideas")]
+    
+    payloads = [json.loads(event[len(b"data: "):]) for event in events]
+    assert "".join(p.get("delta", "") for p in payloads) == "First reply"
+    assert payloads[-1]["done"] is True
+    assert payloads[-1]["thread_name"] == "ideas"
+    
+    messages = repository.get_thread_messages(payloads[-1]["thread_id"])
+    assert [(m.role, m.content) for m in messages] == [
+        ("user", "Hello"),
+        ("assistant", "First reply"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_achat_existing_thread_skips_graph(agent, repository, monkeypatch):
+    """Test that a turn in an existing, explicitly named thread bypasses the graph."""
+    first = await agent.achat(repository, "test_user", "Hello", thread_name="ideas")
+    
+    async def fail_ainvoke(state, config=None):
+        raise AssertionError("graph should not run for an existing thread")
+    
+    monkeypatch.setattr(agent, "graph", SimpleNamespace(ainvoke=fail_ainvoke))
+    second = await agent.achat(repository, "test_user", "Tell me more", thread_name="ideas")
+    
+    assert second["thread_id"] == first["thread_id"]
+    assert second["response"] == "Second reply"
+
+
+def test_agent_services_share_one_agent(repository, monkeypatch):
+    """Test that per-request services reuse the process-wide agent."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(graph, "_agent", None)
+    
+    first = AgentService(repository).agent
+    second = AgentService(repository).agent
+    
+    assert first is second
+
+
+@pytest.mark.asyncio
+async def test_achat_new_named_thread_looked_up_once(agent, repository, monkeypatch):
+    """Test that a missing named thread is created without querying for it again."""
+    lookups = []
+    get_thread = repository.get_thread
+    
+    def counting_get_thread(user_id, thread_name):
+        lookups.append(thread_name)
+        return get_thread(user_id, thread_name)
+    
+    monkeypatch.setattr(repository, "get_thread", counting_get_thread)
+    result = await agent.achat(repository, "test_user", "Hello", thread_name="ideas")
+    
+    assert lookups == ["ideas"]
+    assert result["thread_name"] == "ideas"
+    assert result["persona_prompt"] == BASE_META_PROMPT
+
+
+@pytest.mark.asyncio
+async def test_achat_batch_answers_each_item(agent, repository):
+    """Test that a batch routes every item and saves each turn to its thread."""
+    existing = await agent.achat(repository, "user_one", "Hello", thread_name="ideas")
+    
+    results = await agent.achat_batch(repository, [
+        {"user_id": "user_one", "message": "Tell me more", "thread_name": "ideas"},
+        {"user_id": "user_two", "message": "act like an investor"},
+    ])
+    
+    assert [r["thread_name"] for r in results] == ["ideas", "investor"]
+    assert results[0]["thread_id"] == existing["thread_id"]
+    assert sorted(r["response"] for r in results) == ["Second reply", "Third reply"]
+    assert len(repository.get_thread_messages(existing["thread_id"])) == 4
+    assert len(repository.get_thread_messages(results[1]["thread_id"])) == 2
+
+
+@pytest.mark.asyncio
+async def test_achat_batch_reuses_thread_created_in_batch(agent, repository):
+    """Test that items naming the same new thread share the thread created for the first."""
+    results = await agent.achat_batch(repository, [
+        {"user_id": "test_user", "message": "Hello", "thread_name": "ideas"},
+        {"user_id": "test_user", "message": "And another thing", "thread_name": "ideas"},
+    ])
+    
+    assert results[0]["thread_id"] == results[1]["thread_id"]
+    assert len(repository.get_thread_messages(results[0]["thread_id"])) == 4
+
+
+class _ChatCompletionsHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible chat completions endpoint with keep-alive connections."""
+    protocol_version = "HTTP/1.1"
+    
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps({
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-3.5-turbo",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "Stub reply"},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def openai_stub(monkeypatch):
+    """Serve chat completions locally and point a fresh shared LLM client at it."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ChatCompletionsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_API_BASE", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setattr(graph, "_LLM_CACHE", {})
+    monkeypatch.setattr(graph, "_agent", None)
+    yield
+    server.shutdown()
+    server.server_close()
+
+
+def test_sync_chat_reuses_pooled_connections(openai_stub, repository):
+    """Test that repeated sync chats work with the shared, pooled LLM client."""
+    service = AgentService(repository)
+    
+    first = service.chat("test_user", "Hello", thread_name="ideas")
+    second = service.chat("test_user", "Tell me more", thread_name="ideas")
+    
+    assert first["response"] == second["response"] == "Stub reply"
+    assert len(repository.get_thread_messages(second["thread_id"])) == 4
+
+
+class PoolWatchingChatModel(FakeListChatModel):
+    """Fake chat model that waits for all concurrent turns, then records pool usage."""
+    engine: object = None
+    barrier: object = None
+    checked_out: list = []
+    
+    async def ainvoke(self, input, *args, **kwargs):
+        await asyncio.wait_for(self.barrier.wait(), timeout=5)
+        self.checked_out.append(self.engine.pool.checkedout())
+        return await super().ainvoke(input, *args, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_turns_release_connections_during_llm_call(agent, tmp_path):
+    """Test that turns waiting on the LLM do not hold database connections."""
+    turns = 5
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        connect_args={"check_same_thread": False},
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=10
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    # Every turn must reach the LLM at the same time, which a single pooled
+    # connection only allows if none of them holds it across the call
+    agent.llm = PoolWatchingChatModel(
+        responses=["Reply"], engine=engine, barrier=asyncio.Barrier(turns), checked_out=[]
+    )
+    
+    sessions = [SessionLocal() for _ in range(turns)]
+    try:
+        results = await asyncio.gather(*(
+            agent.achat(ThreadRepository(session), f"user_{index}", "Hello", thread_name="ideas")
+            for index, session in enumerate(sessions)
+        ))
+    finally:
+        for session in sessions:
+            session.close()
+        engine.dispose()
+    
+    assert len({result["thread_id"] for result in results}) == turns
+    assert agent.llm.checked_out == [0] * turns
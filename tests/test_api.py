@@ -6,13 +6,15 @@ from fastapi.testclient import TestClient
 from app.main import app
 from app.models.database import init_db
 
-# Initialize test database
-init_db()
 
-client = TestClient(app)
+@pytest.fixture(scope="module")
+def client():
+    """Create a test client backed by an initialized database."""
+    init_db()
+    return TestClient(app)
 
 
-def test_root_endpoint():
+def test_root_endpoint(client):
     """Test root endpoint."""
     response = client.get("/")
     assert response.status_code == 200
@@ -20,14 +22,14 @@ def test_root_endpoint():
     assert "endpoints" in response.json()
 
 
-def test_health_check():
+def test_health_check(client):
     """Test health check endpoint."""
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json()["status"] == "healthy"
 
 
-def test_chat_endpoint_missing_api_key():
+def test_chat_endpoint_missing_api_key(client):
     """Test chat endpoint without API key (should fail gracefully)."""
     # This test will fail if OPENAI_API_KEY is not set, which is expected
     # In a real scenario, we'd mock the LLM
@@ -42,7 +44,7 @@ def test_chat_endpoint_missing_api_key():
     assert response.status_code in [200, 500]
 
 
-def test_chat_history_endpoint():
+def test_chat_history_endpoint(client):
     """Test chat history endpoint."""
     response = client.get("/chat_history?user_id=test_user")
     assert response.status_code == 200
@@ -50,9 +52,34 @@ def test_chat_history_endpoint():
     assert "threads" in response.json()
 
 
-def test_chat_history_invalid_user():
+def test_chat_history_invalid_user(client):
     """Test chat history with invalid user_id."""
     response = client.get("/chat_history?user_id=")
     # Should return 400 or empty threads
     assert response.status_code in [200, 400]
 
+
+def test_chat_stream_invalid_user(client):
+    """Test streaming chat rejects an empty user_id before streaming starts."""
+    response = client.post(
+        "/chat/stream",
+        json={
+            "user_id": "",
+            "message": "Hello"
+        }
+    )
+    assert response.status_code == 400
+
+
+def test_chat_bulk_invalid_user(client):
+    """Test bulk chat rejects an item with an empty user_id."""
+    response = client.post(
+        "/chat/bulk",
+        json={
+            "items": [
+                {"user_id": "test_user", "message": "Hello"},
+                {"user_id": "", "message": "Hello"}
+            ]
+        }
+    )
+    assert response.status_code == 400
@@ -0,0 +1,125 @@
+"""
+Tests for the batch chat service.
+"""
+import asyncio
+import json
+import threading
+import pytest
+from types import SimpleNamespace
+from app.services.agent_service import AgentService
+from app.services.batch_service import BatchService
+
+
+class FakeOpenAIClient:
+    """Records uploaded batch files and returns canned batch objects."""
+    
+    def __init__(self):
+        self.uploaded = None
+        self.files = SimpleNamespace(create=self._create_file)
+        self.batches = SimpleNamespace(create=self._create_batch)
+    
+    async def _create_file(self, file, purpose):
+        self.uploaded = file[1].decode("utf-8")
+        return SimpleNamespace(id="file-123")
+    
+    async def _create_batch(self, input_file_id, endpoint, completion_window):
+        return SimpleNamespace(id="batch-123", status="validating")
+
+
+@pytest.fixture
+def batch_service(repository, monkeypatch):
+    """Create a batch service with a fake OpenAI client."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    return BatchService(AgentService(repository), client=FakeOpenAIClient())
+
+
+@pytest.mark.asyncio
+async def test_submit_batch_uploads_one_request_per_item(batch_service, repository):
+    """Test that each item becomes a chat completion request for its thread."""
+    result = await batch_service.submit_batch([
+        {"user_id": "test_user", "message": "act like my mentor"},
+        {"user_id": "test_user", "message": "Hello", "thread_name": "ideas"},
+    ])
+    
+    assert result == {"batch_id": "batch-123", "status": "validating", "request_count": 2}
+    
+    requests = [json.loads(line) for line in batch_service.client.uploaded.splitlines()]
+    mentor_thread = repository.get_thread("test_user", "mentor")
+    assert requests[0]["custom_id"] == f"{mentor_thread.id}-0"
+    assert requests[0]["body"]["messages"][0]["role"] == "system"
+    assert requests[1]["body"]["messages"][-1] == {"role": "user", "content": "Hello"}
+
+
+def test_persist_results_saves_successful_turns(repository, sample_thread):
+    """Test that successful batch responses are saved with their user messages."""
+    input_text = "\n".join(json.dumps({
+        "custom_id": f"{sample_thread.id}-{i}",
+        "body": {"messages": [{"role": "user", "content": f"Question {i}"}]}
+    }) for i in range(2))
+    output_text = "\n".join([
+        json.dumps({
+            "custom_id": f"{sample_thread.id}-0",
+            "response": {
+                "status_code": 200,
+                "body": {"choices": [{"message": {"content": "Answer 0"}}]}
+            }
+        }),
+        json.dumps({
+            "custom_id": f"{sample_thread.id}-1",
+            "response": {"status_code": 500, "body": {}}
+        }),
+    ])
+    
+    saved = BatchService.persist_results(repository, input_text, output_text)
+    
+    assert saved == 1
+    messages = repository.get_thread_messages(sample_thread.id)
+    assert [(m.role, m.content) for m in messages] == [
+        ("user", "Question 0"),
+        ("assistant", "Answer 0"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stop_polling_cancels_running_tasks(monkeypatch):
+    """Test that polling runs detached from the request and is cancelled at shutdown."""
+    started = asyncio.Event()
+    
+    async def wait_forever(batch_id, client=None):
+        started.set()
+        await asyncio.Event().wait()
+    
+    monkeypatch.setattr(BatchService, "poll_and_persist", staticmethod(wait_forever))
+    task = BatchService.start_polling("batch-123")
+    await started.wait()
+    
+    await BatchService.stop_polling()
+    
+    assert task.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_poll_and_persist_saves_off_the_event_loop(monkeypatch):
+    """Test that a finished batch's results are written from a worker thread."""
+    async def retrieve(batch_id):
+        return SimpleNamespace(status="completed", input_file_id="in", output_file_id="out")
+    
+    async def content(file_id):
+        return SimpleNamespace(text=file_id)
+    
+    client = SimpleNamespace(
+        batches=SimpleNamespace(retrieve=retrieve),
+        files=SimpleNamespace(content=content)
+    )
+    
+    calls = []
+    
+    def record_persist(input_text, output_text):
+        calls.append((input_text, output_text, threading.current_thread()))
+        return 0
+    
+    monkeypatch.setattr(BatchService, "_persist_in_new_session", staticmethod(record_persist))
+    await BatchService.poll_and_persist("batch-123", client=client)
+    
+    assert [call[:2] for call in calls] == [("in", "out")]
+    assert calls[0][2] is not threading.main_thread()
@@ -0,0 +1,23 @@
+"""
+Tests for database engine configuration.
+"""
+from sqlalchemy.pool import StaticPool
+from app.core.config import settings
+from app.models.database import _engine_options
+
+
+def test_engine_options_file_sqlite_uses_pool_settings():
+    """Test that file-backed SQLite honours the configured pool size."""
+    options = _engine_options("sqlite:///chatbot.db")
+    
+    assert options["pool_size"] == settings.database_pool_size
+    assert options["max_overflow"] == settings.database_max_overflow
+    assert "poolclass" not in options
+
+
+def test_engine_options_memory_sqlite_uses_static_pool():
+    """Test that in-memory SQLite shares one connection."""
+    options = _engine_options("sqlite:///:memory:")
+    
+    assert options["poolclass"] is StaticPool
+    assert "pool_size" not in options
@@ -13,12 +13,27 @@ def test_extract_persona_request():
     assert PersonaManager.extract_persona_request("Hello, how are you?") is None
 
 
+def test_extract_persona_request_skips_stopwords():
+    """Test that stopword captures don't hide a later persona request."""
+    assert PersonaManager.extract_persona_request("in this thread, act like an investor") == "investor"
+    assert PersonaManager.extract_persona_request("switch to the coach") == "coach"
+
+
+def test_extract_persona_request_pattern_priority():
+    """Test that an earlier pattern wins even when a later one matches first in the text."""
+    message = "It would be great if you could act like my mentor"
+    assert PersonaManager.extract_persona_request(message) == "mentor"
+    assert PersonaManager.extract_persona_request("my coach thread, switch to investor") == "investor"
+
+
 def test_normalize_thread_name():
     """Test thread name normalization."""
     assert PersonaManager.normalize_thread_name("Mentor") == "mentor"
     assert PersonaManager.normalize_thread_name("Business Advisor") == "business_advisor"
     assert PersonaManager.normalize_thread_name("Investor!") == "investor"
     assert PersonaManager.normalize_thread_name("Test-Thread") == "testthread"
+    assert PersonaManager.normalize_thread_name("  Growth Coach  ") == "growth_coach"
+    assert PersonaManager.normalize_thread_name("Café Owner") == "caf_owner"
 
 
 def test_get_persona_prompt():
@@ -41,3 +56,15 @@ def test_is_thread_switch_request():
     assert PersonaManager.is_thread_switch_request("return to advisor") is True
     assert PersonaManager.is_thread_switch_request("Hello, how are you?") is False
 
+
+def test_analyze_message():
+    """Test combined persona and thread switch detection."""
+    assert PersonaManager.analyze_message("Switch to Advisor") == ("advisor", True)
+    assert PersonaManager.analyze_message("act like my mentor") == ("mentor", False)
+    assert PersonaManager.analyze_message("Hello, how are you?") == (None, False)
+
+
+def test_analyze_message_mixed_case():
+    """Test that detection is case-insensitive for lowercase and mixed-case input."""
+    assert PersonaManager.analyze_message("go back to the coach") == ("coach", True)
+    assert PersonaManager.analyze_message("Go Back To The Coach") == ("coach", True)
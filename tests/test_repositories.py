@@ -3,7 +3,7 @@ Tests for repository layer.
 """
 import pytest
 from app.repositories.thread_repository import ThreadRepository
-from app.core.exceptions import DatabaseError, ThreadNotFoundError
+from app.core.exceptions import ThreadNotFoundError
 
 
 def test_create_thread(repository):
@@ -20,6 +20,45 @@ def test_create_thread(repository):
     assert thread.persona_prompt == "You are a mentor."
 
 
+def test_create_thread_shares_persona(repository):
+    """Test that threads with the same prompt share one stored persona."""
+    thread1 = repository.create_thread("user_one", "mentor", "Mentor prompt")
+    thread2 = repository.create_thread("user_two", "mentor", "Mentor prompt")
+    thread3 = repository.create_thread("user_one", "investor", "Investor prompt")
+    
+    assert thread1.persona_id == thread2.persona_id
+    assert thread3.persona_id != thread1.persona_id
+    assert thread2.persona_prompt == "Mentor prompt"
+
+
+def test_create_thread_persona_insert_race(repository, monkeypatch):
+    """Test that a persona stored by another request after the lookup is reused."""
+    first = repository.create_thread("user_one", "pirate", "Pirate prompt")
+    
+    # Simulate the other request committing between this request's lookup and insert
+    find_persona = repository._find_persona
+    lookups = []
+    
+    def miss_first_lookup(prompt_hash):
+        lookups.append(prompt_hash)
+        return None if len(lookups) == 1 else find_persona(prompt_hash)
+    
+    monkeypatch.setattr(repository, "_find_persona", miss_first_lookup)
+    second = repository.create_thread("user_two", "pirate", "Pirate prompt")
+    
+    assert len(lookups) == 2
+    assert second.persona_id == first.persona_id
+
+
+def test_create_duplicate_thread(repository, sample_thread):
+    """Test that creating a thread that already exists returns it unchanged."""
+    thread = repository.create_thread("test_user", "mentor", "Another mentor prompt")
+    
+    assert thread.id == sample_thread.id
+    assert thread.persona_prompt == "You are a mentor."
+    assert len(repository.get_all_threads("test_user")) == 1
+
+
 def test_get_thread(repository, sample_thread):
     """Test retrieving a thread."""
     thread = repository.get_thread("test_user", "mentor")
@@ -61,6 +100,7 @@ def test_add_message(repository, sample_thread):
     assert message.thread_id == sample_thread.id
     assert message.role == "user"
     assert message.content == "Hello, mentor!"
+    assert message.timestamp is not None
 
 
 def test_get_thread_messages(repository, sample_thread):
@@ -109,3 +149,54 @@ def test_get_user_chat_history(repository):
     assert len(history["mentor"]["messages"]) == 1
     assert len(history["investor"]["messages"]) == 1
 
+
+def test_get_user_chat_history_message_order(repository, sample_thread):
+    """Test that chat history returns messages in insertion order."""
+    repository.add_message(sample_thread.id, "user", "First")
+    repository.add_message(sample_thread.id, "assistant", "Second")
+    repository.add_message(sample_thread.id, "user", "Third")
+    
+    history = repository.get_user_chat_history("test_user")
+    
+    contents = [msg["content"] for msg in history["mentor"]["messages"]]
+    assert contents == ["First", "Second", "Third"]
+
+
+def test_add_messages_bulk(repository, sample_thread):
+    """Test adding several messages to a thread at once."""
+    updated_at = repository.add_messages_bulk(
+        sample_thread.id,
+        [("user", "Hello"), ("assistant", "Hi there!")]
+    )
+    
+    messages = repository.get_thread_messages(sample_thread.id)
+    
+    assert [(m.role, m.content) for m in messages] == [
+        ("user", "Hello"),
+        ("assistant", "Hi there!"),
+    ]
+    # Timestamps are strictly increasing so the turn's order never depends on ties
+    assert messages[0].timestamp < messages[1].timestamp == updated_at
+
+
+def test_get_thread_history_tuples(repository, sample_thread):
+    """Test retrieving a thread's history as (role, content) pairs."""
+    repository.add_message(sample_thread.id, "user", "Hello")
+    repository.add_message(sample_thread.id, "assistant", "Hi there!")
+    
+    history = repository.get_thread_history_tuples(sample_thread.id)
+    
+    assert [tuple(row) for row in history] == [("user", "Hello"), ("assistant", "Hi there!")]
+
+
+def test_get_threads_for_users(repository):
+    """Test fetching named threads of several users at once."""
+    repository.create_thread("user_one", "mentor", "Mentor prompt")
+    repository.create_thread("user_two", "investor", "Investor prompt")
+    repository.create_thread("user_three", "mentor", "Mentor prompt")
+    
+    threads = repository.get_threads_for_users(["user_one", "user_two"], ["mentor", "investor"])
+    
+    assert set(threads) == {("user_one", "mentor"), ("user_two", "investor")}
+    assert threads[("user_two", "investor")].persona_prompt == "Investor prompt"
+    assert repository.get_threads_for_users([], ["mentor"]) == {}